@@ -1,5 +1,22 @@
 from flask import Flask, render_template, request, redirect, url_for, session
+from flask_caching import Cache
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from functools import lru_cache
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from numba import njit
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
+import requests
 from pydfs_lineup_optimizer import get_optimizer, Site, Sport, Player
 from pydfs_lineup_optimizer.stacks import PositionsStack
 import warnings
@@ -9,6 +26,12 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 app = Flask(__name__)
 app.secret_key = 'your-secret-key'
 
+PLAYERS_CACHE_TIMEOUT = 300
+cache = Cache(app, config={
+    'CACHE_TYPE': 'SimpleCache',
+    'CACHE_DEFAULT_TIMEOUT': PLAYERS_CACHE_TIMEOUT
+})
+
 CSV_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQEcvQUS_HIbxKp4SbD5HUMJvhLr7tP6yXNVHMul6Ad2PrIQZF9VKgqAmESJBp4CkjfcDxvClpBqK6M/pub?gid=1236050410&single=true&output=csv"
 
 DISPLAY_COLUMNS = [
@@ -34,68 +57,160 @@ COLUMN_MAP = {
     'POSITION': 'POS'
 }
 
+# Parsed player frame from the last full download, reused while the sheet is unchanged
+SNAPSHOT_PATH = os.path.join(tempfile.gettempdir(), 'nfldfs.feather')
+SNAPSHOT_META_PATH = os.path.join(tempfile.gettempdir(), 'nfldfs.meta.json')
+# The snapshot holds derived columns, so any change to this module invalidates it
+with open(__file__, 'rb') as _source:
+    SNAPSHOT_VERSION = hashlib.md5(_source.read()).hexdigest()
+
+# Sheet columns read from the CSV; everything else is skipped at parse time
+NEEDED_COLUMNS = set(DISPLAY_COLUMNS) | set(COLUMN_MAP) | set(COLUMN_MAP.values())
+
 # ----------------- Utility Functions -----------------
-def display_pos(positions):
-    if isinstance(positions, str):
-        pos_list = [p.strip().upper() for p in positions.replace("/", ",").split(",") if p.strip()]
-    else:
-        pos_list = [p.upper() for p in positions]
+@lru_cache(maxsize=512)
+def _display_pos_str(positions):
+    pos_list = [p.strip().upper() for p in positions.replace("/", ",").split(",") if p.strip()]
     return "/".join(sorted(set(pos_list)))
 
-def safe_float(val, default=0.0):
-    try:
-        return float(val)
-    except (TypeError, ValueError):
-        return default
-
-def compute_adjusted_proj(row):
-    proj = safe_float(row.get('FINAL PROJECTION', 0))
-    dvp = safe_float(row.get('DVP', 0))
-    l5 = safe_float(row.get('L5 AVG', 0))
-    szn = safe_float(row.get('SZ AVG', 0))
-
-    adj = proj
-    if dvp < 5:
-        adj -= 1.5
-    if abs(l5 - szn) <= 5 and l5 > 14:
-        adj += 1.5
-    adj *= 0.75
-    return round(adj, 2)
-
-def parse_hour_and_minute(game_time_str):
-    if not isinstance(game_time_str, str) or ":" not in game_time_str:
-        return pd.Series([None, None])
-    try:
-        parts = game_time_str.strip().split(":")
-        hour = int(parts[0])
-        minute = int(parts[1][:2])
-        am_pm = game_time_str.strip()[-2:].upper()
-        if am_pm == "PM" and hour != 12:
-            hour += 12
-        elif am_pm == "AM" and hour == 12:
-            hour = 0
-        return pd.Series([hour, minute])
-    except:
-        return pd.Series([None, None])
+def display_pos(positions):
+    if not isinstance(positions, str):
+        positions = ",".join(positions)
+    return _display_pos_str(positions)
+
+def numeric_array(series):
+    # Unparseable values count as 0; real blanks stay NaN
+    values = pd.to_numeric(series, errors='coerce').fillna(0).where(series.notna())
+    return values.to_numpy(dtype=float, na_value=np.nan)
+
+@njit(cache=True)
+def _adjust_projections(proj, dvp, l5, szn, out):
+    # NaN stats fail every comparison, so neither adjustment fires for blanks
+    for i in range(proj.shape[0]):
+        adj = proj[i]
+        if dvp[i] < 5:
+            adj -= 1.5
+        if abs(l5[i] - szn[i]) <= 5 and l5[i] > 14:
+            adj += 1.5
+        out[i] = adj * 0.75
+
+def compute_adjusted_proj(df):
+    proj = pd.to_numeric(df['FINAL PROJECTION'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    dvp = numeric_array(df['DVP'])
+    l5 = numeric_array(df['L5 AVG'])
+    szn = numeric_array(df['SZ AVG'])
+
+    out = np.empty_like(proj)
+    _adjust_projections(proj, dvp, l5, szn, out)
+    return np.round(out, 2)
+
+def parse_game_minutes(game_times):
+    # Minutes after midnight for strings like "1:00 PM"; NaN when unparseable
+    gt = game_times.astype(str).str.strip()
+    parts = gt.str.extract(r'^(\d{1,2}):(\d{2})')
+    hour = pd.to_numeric(parts[0], errors='coerce')
+    minute = pd.to_numeric(parts[1], errors='coerce')
+    am_pm = gt.str[-2:].str.upper()
+    hour = hour.mask((am_pm == "PM") & (hour != 12), hour + 12)
+    hour = hour.mask((am_pm == "AM") & (hour == 12), 0)
+    return hour * 60 + minute
 
 def filter_by_game_time(df, time_filter):
     df = df.copy()
-    hour_minute_df = df["GAME TIME"].apply(parse_hour_and_minute)
-    hour_minute_df.columns = ["HOUR", "MINUTE"]
-    df = pd.concat([df, hour_minute_df], axis=1)
+    df["GAME_MIN"] = parse_game_minutes(df["GAME TIME"])
+    early = (df["GAME_MIN"] >= 13 * 60) & (df["GAME_MIN"] < 14 * 60)
+    late = (df["GAME_MIN"] >= 16 * 60) & (df["GAME_MIN"] < 17 * 60)
     if time_filter == "all":
-        filtered = df[((df["HOUR"] == 13) | (df["HOUR"] == 16))]
+        filtered = df[early | late]
     elif time_filter == "1pm":
-        filtered = df[(df["HOUR"] == 13)]
+        filtered = df[early]
     elif time_filter == "late":
-        filtered = df[(df["HOUR"] == 16)]
+        filtered = df[late]
     else:
         filtered = df
     return filtered
 
+# ----------------- Player Snapshot -----------------
+def read_snapshot_meta():
+    if not os.path.exists(SNAPSHOT_PATH):
+        return None
+    try:
+        with open(SNAPSHOT_META_PATH) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != SNAPSHOT_VERSION or meta.get('url') != CSV_URL:
+        return None
+    return meta
+
+def read_snapshot(meta):
+    try:
+        return pd.read_feather(SNAPSHOT_PATH), meta['all_teams']
+    except (OSError, ValueError, KeyError) as e:
+        print("Snapshot error:", e)
+        return None
+
+def write_atomic(path, write):
+    # Write to a temp file in the same directory, then swap it in so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def dump_json(meta, path):
+    with open(path, 'w') as f:
+        json.dump(meta, f)
+
+def save_snapshot(df, all_teams, response):
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'url': CSV_URL,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'all_teams': all_teams
+    }
+    if not meta['etag'] and not meta['last_modified']:
+        return
+    try:
+        write_atomic(SNAPSHOT_PATH, df.reset_index(drop=True).to_feather)
+        write_atomic(SNAPSHOT_META_PATH, lambda path: dump_json(meta, path))
+    except (OSError, ValueError) as e:
+        print("Snapshot error:", e)
+
 # ----------------- Load & Clean Players -----------------
+@cache.cached(timeout=PLAYERS_CACHE_TIMEOUT, key_prefix='players')
 def load_players():
-    df_raw = pd.read_csv(CSV_URL)
+    headers = {'Accept-Encoding': 'gzip'}
+    meta = read_snapshot_meta()
+    if meta:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    response = requests.get(CSV_URL, headers=headers, timeout=10)
+    if response.status_code == 304 and meta:
+        snapshot = read_snapshot(meta)
+        if snapshot is not None:
+            return snapshot
+        # Unreadable snapshot: drop the validators so the sheet is downloaded in full
+        response = requests.get(CSV_URL, headers={'Accept-Encoding': 'gzip'}, timeout=10)
+    response.raise_for_status()
+    header = next(csv.reader([response.content.split(b'\n', 1)[0].decode('utf-8-sig')]))
+    usecols = list(dict.fromkeys(c for c in header if c.strip().upper() in NEEDED_COLUMNS))
+    table = pacsv.read_csv(
+        io.BytesIO(response.content),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=usecols,
+            column_types={c: pa.string() for c in usecols if c.strip().upper() in ('SALARY', 'OWN %')}
+        )
+    )
+    # Arrow-backed strings only; numeric columns stay NumPy so fillna('') still works for display
+    df_raw = table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
     df_raw.columns = [c.strip().upper() for c in df_raw.columns]
     df_raw = df_raw.rename(columns={k.upper(): v for k, v in COLUMN_MAP.items()})
     df_raw = df_raw.loc[:, ~df_raw.columns.duplicated(keep='first')]
@@ -105,62 +220,149 @@ def load_players():
             df_raw[col] = ""
 
     if 'SALARY' in df_raw.columns:
-        def parse_salary(x):
-            try:
-                val = str(x).replace('$','').replace(',','').replace('k','')
-                f = float(val)
-                return int(f * 1000) if f < 100 else int(f)
-            except:
-                return 0
-        df_raw['SALARY'] = df_raw['SALARY'].apply(parse_salary)
+        salary = df_raw['SALARY'].astype(str).str.replace(r'[$,k]', '', regex=True)
+        salary = pd.to_numeric(salary, errors='coerce').fillna(0.0).to_numpy()
+        df_raw['SALARY'] = np.where(salary < 100, salary * 1000, salary).astype(np.int32)
 
     df_raw = df_raw[df_raw['SALARY'] > 0]
     df_raw['FINAL PROJECTION'] = pd.to_numeric(df_raw.get('FINAL PROJECTION', 0), errors='coerce').fillna(0)
-    df_raw['ADJ PROJECTION'] = df_raw.apply(compute_adjusted_proj, axis=1)
+    df_raw['ADJ PROJECTION'] = compute_adjusted_proj(df_raw)
     df_raw = df_raw[df_raw['FINAL PROJECTION'] > 0]
 
     df_raw['POS'] = df_raw['POS'].astype(str).str.strip().str.upper()
-    df_raw['unique_id'] = df_raw.apply(lambda row: f"{row.get('NAME','')}_{row.name}", axis=1)
-    all_teams = sorted([team for team in df_raw['TEAM'].dropna().astype(str).str.upper().unique() if team.strip()])
+    # Normalized once so the stack dropdown, Player.team and PositionsStack all agree
+    df_raw['TEAM'] = df_raw['TEAM'].astype('string').str.strip().str.upper()
+    for col in ('TEAM', 'OPP', 'POS'):
+        df_raw[col] = df_raw[col].fillna('').astype('category')
+    df_raw['unique_id'] = df_raw['NAME'].astype(str) + '_' + df_raw.index.astype(str)
+    teams = pd.Series(df_raw['TEAM'].cat.categories.astype(str))
+    all_teams = np.sort(teams[teams.str.len() > 0].to_numpy(dtype=object)).tolist()
+    save_snapshot(df_raw, all_teams, response)
     return df_raw, all_teams
 
+@cache.memoize(timeout=PLAYERS_CACHE_TIMEOUT)
+def load_filtered_players(time_filter):
+    # Keyed on time_filter only; the player frame is the same across cached loads
+    df, _ = load_players()
+    return filter_by_game_time(df, time_filter)
+
+# ----------------- Player Pool Payload -----------------
+def pool_cache_key(time_filter, excluded_ids):
+    excluded_hash = hashlib.md5(",".join(sorted(excluded_ids or [])).encode()).hexdigest()
+    return f"pool:{time_filter}:{excluded_hash}"
+
+LINEUP_COLUMNS = ['unique_id', 'NAME', 'TEAM', 'POS', 'SALARY', 'ADJ PROJECTION']
+
+def lineup_frame(df):
+    # Thin copy of the player frame; the wide one is only needed for display.
+    # ADJ PROJECTION stays float64 so lineup totals match the displayed values.
+    return df[LINEUP_COLUMNS].astype({'SALARY': np.int32})
+
+def build_pool_payload(df):
+    # Only the columns build_lineups needs, as plain arrays; expects a lineup_frame
+    return {
+        'ids': df['unique_id'].to_numpy(),
+        'name': df['NAME'].to_numpy(),
+        'team': df['TEAM'].to_numpy(),
+        'pos': df['POS'].astype(str).str.strip().str.upper().str.split('/').to_numpy(),
+        'salary': df['SALARY'].to_numpy(),
+        'fppg': df['ADJ PROJECTION'].to_numpy(),
+    }
+
+def get_pool_payload(time_filter, excluded_ids):
+    key = pool_cache_key(time_filter, excluded_ids)
+    payload = cache.get(key)
+    if payload is None:
+        df = lineup_frame(load_filtered_players(time_filter))
+        if excluded_ids:
+            df = df[~df['unique_id'].isin(excluded_ids)]
+        payload = build_pool_payload(df)
+        cache.set(key, payload, timeout=PLAYERS_CACHE_TIMEOUT)
+    return payload
+
+# ----------------- Prune Dominated Players -----------------
+# DraftKings roster spots each position can fill, FLEX included
+POSITION_SLOTS = {'QB': 1, 'RB': 3, 'WR': 4, 'TE': 2, 'DST': 1}
+
+def prune_dominated(players, depth=1, protected=()):
+    # Drop players beaten on both salary and projection by enough players who can
+    # fill every position they can; such a player can't appear in the top `depth` lineups
+    if not players:
+        return players
+    ids = np.array([p.id for p in players], dtype=object)
+    salary = np.array([p.salary for p in players])
+    fppg = np.array([p.fppg for p in players])
+    pos_sets = [frozenset(p.positions) for p in players]
+
+    keep = np.ones(len(players), dtype=bool)
+    for group in set(pos_sets):
+        members = np.array([s == group for s in pos_sets])
+        rivals = np.array([s >= group for s in pos_sets])
+        limit = max(POSITION_SLOTS.get(pos, 1) for pos in group) + depth - 1
+        better = ((fppg[rivals][None, :] > fppg[members][:, None]) &
+                  (salary[rivals][None, :] <= salary[members][:, None]))
+        keep[members] = better.sum(axis=1) < limit
+
+    if protected:
+        keep |= np.isin(ids, list(protected))
+    return [p for p, k in zip(players, keep) if k]
+
+# ----------------- Lineup Exposure -----------------
+# Above this many lineups, cap how often any unlocked, unstacked player is used (pydfs max_exposure)
+EXPOSURE_MIN_LINEUPS = 20
+MAX_EXPOSURE = 0.6
+
 # ----------------- Build Lineups -----------------
-def build_lineups(df, num_lineups=1, locked_ids=None, excluded_ids=None, stack_team=None):
+@lru_cache(maxsize=64)
+def team_stack(stack_team):
+    return PositionsStack(['QB', ('RB','WR','TE'), ('RB','WR','TE')], for_teams=[stack_team])
+
+def build_lineups(pool, num_lineups=1, locked_ids=None, stack_team=None, deadline=None):
+    # pool comes from get_pool_payload/build_pool_payload with exclusions already applied
     optimizer = get_optimizer(Site.DRAFTKINGS, Sport.FOOTBALL)
     players = []
 
     DK_NFL_SLOTS = ['QB', 'RB', 'RB', 'WR', 'WR', 'WR', 'TE', 'FLEX', 'DST']
-
-    if excluded_ids:
-        df = df[~df['unique_id'].isin(excluded_ids)]
-
-    df['POS'] = df['POS'].astype(str).str.strip().str.upper()
-
-    for _, row in df.iterrows():
-        positions = [p.strip().upper() for p in str(row.get('POS', '')).split('/')]
-        salary = int(row.get('SALARY', 0) or 0)
-        fppg = safe_float(row.get('ADJ PROJECTION', 0))
-        if salary <= 0 or fppg <= 0 or not positions or positions == ['']:
+    max_exposure = MAX_EXPOSURE if num_lineups > EXPOSURE_MIN_LINEUPS else None
+    # pydfs measures exposure against n, so only over-ask when there is no cap
+    num_candidates = num_lineups if max_exposure else num_lineups * 3
+
+    columns = (pool[c] for c in ('ids', 'name', 'team', 'pos', 'salary', 'fppg'))
+    for pid, name, team, pos, salary, fppg in zip(*columns):
+        pos = [p.strip() for p in pos if p.strip()]
+        if salary <= 0 or fppg <= 0 or not pos:
             continue
-        player = Player(
-            player_id=row['unique_id'],
-            first_name=row.get('NAME',''),
+        players.append(Player(
+            player_id=pid,
+            first_name=name,
             last_name='',
-            positions=positions,
-            team=row.get('TEAM',''),
-            salary=salary,
-            fppg=fppg
-        )
-        players.append(player)
+            positions=pos,
+            team=team,
+            salary=int(salary),
+            fppg=float(fppg)
+        ))
+
+    # Locked and stacked players must be free to appear in every lineup: dominance
+    # ignores them, and the exposure cap exempts them. Exposure caps can bench every
+    # dominator, so pruning only runs for uncapped requests.
+    locked_ids = frozenset(locked_ids or ())
+    protected = set(locked_ids)
+    if stack_team:
+        protected.update(p.id for p in players if p.team == stack_team)
+    if max_exposure:
+        for p in players:
+            if p.id in protected:
+                p.max_exposure = 1.0
+    else:
+        players = prune_dominated(players, depth=num_candidates, protected=protected)
 
     optimizer.load_players(players)
+    players_by_id = {p.id: p for p in players}
 
     # ----------------- Stack by Selected Team -----------------
     if stack_team:
         try:
-            optimizer.add_stack(
-                PositionsStack(['QB', ('RB','WR','TE'), ('RB','WR','TE')], for_teams=[stack_team])
-            )
+            optimizer.add_stack(team_stack(stack_team))
         except Exception as e:
             print("Stacking error:", e)
 
@@ -168,32 +370,84 @@ def build_lineups(df, num_lineups=1, locked_ids=None, excluded_ids=None, stack_t
 
     if locked_ids:
         for pid in locked_ids:
-            p = next((pl for pl in players if pl.id == pid), None)
+            p = players_by_id.get(pid)
             if p:
                 optimizer.add_player_to_lineup(p)
 
     unique_lineups, seen_lineups = [], set()
     try:
-        for lineup in optimizer.optimize(n=num_lineups * 3):
-            ids = tuple(sorted([p.id for p in lineup.players]))
+        for lineup in optimizer.optimize(n=num_candidates, max_exposure=max_exposure):
+            ids = frozenset(p.id for p in lineup.players)
             if ids in seen_lineups:
                 continue
             seen_lineups.add(ids)
-            slot_players = [(slot, p) for slot, p in zip(DK_NFL_SLOTS, lineup.players)]
-            unique_lineups.append(slot_players)
+            unique_lineups.append(lineup)
             if len(unique_lineups) >= num_lineups:
                 break
+            if deadline and time.time() > deadline:
+                print("Optimizer deadline reached after", len(unique_lineups), "lineups")
+                break
     except Exception as e:
         print("Optimizer error:", e)
 
-    return unique_lineups
+    return [[(slot, p) for slot, p in zip(DK_NFL_SLOTS, lineup.players)] for lineup in unique_lineups]
+
+# ----------------- Background Jobs -----------------
+# The optimizer is CPU-bound, so lineups are built in worker processes rather than on
+# the request thread. Futures can't be pickled into the cache, so jobs live in-process.
+EXECUTOR = ProcessPoolExecutor(max_workers=os.cpu_count())
+JOBS = {}
+JOBS_LOCK = threading.Lock()
+# How long a finished job's lineups stay fetchable; running jobs are never evicted
+JOB_RESULT_TTL = 30 * 60
+# Workers stop optimizing after JOB_DEADLINE seconds; the polling page gives up a little later
+JOB_DEADLINE = 120
+JOB_DEADLINE_GRACE = 30
+MAX_ACTIVE_JOBS_PER_SESSION = 2
+MAX_LINEUPS = 50
+
+def build_lineups_pickleable(*args):
+    # LineupPlayer proxies its Player via __getattr__ and can't be unpickled,
+    # so hand back plain dicts with just the fields lineups.html reads
+    return [
+        [(slot, {
+            'full_name': p.full_name,
+            'team': p.team,
+            'positions': list(p.positions),
+            'salary': p.salary,
+            'fppg': p.fppg
+        }) for slot, p in lineup]
+        for lineup in build_lineups(*args)
+    ]
+
+def submit_lineups_job(pool, num_lineups, locked_ids, stack_team, time_filter):
+    created = time.time()
+    job = {
+        'future': EXECUTOR.submit(build_lineups_pickleable, pool, num_lineups, locked_ids, stack_team,
+                                  created + JOB_DEADLINE),
+        'created': created,
+        'finished': None,
+        'num_lineups': num_lineups,
+        'time_filter': time_filter
+    }
+    job['future'].add_done_callback(lambda _: job.update(finished=time.time()))
+
+    job_id = uuid.uuid4().hex
+    with JOBS_LOCK:
+        now = time.time()
+        expired = [j for j, old in JOBS.items()
+                   if old['finished'] is not None and now - old['finished'] > JOB_RESULT_TTL]
+        for j in expired:
+            del JOBS[j]
+        JOBS[job_id] = job
+    return job_id
 
 # ----------------- Flask Routes -----------------
 @app.route("/", methods=["GET", "POST"])
 def player_pool():
     df, teams = load_players()
-    locked_players = session.get('locked_players', [])
-    excluded_players = session.get('excluded_players', [])
+    locked_players = frozenset(session.get('locked_players', []))
+    excluded_players = frozenset(session.get('excluded_players', []))
     num_lineups = session.get('num_lineups', 1)
     time_filter = session.get('time_filter', 'all')
     stack_team = session.get('stack_team', None)
@@ -201,7 +455,11 @@ def player_pool():
     if request.method == "POST":
         locked_players = request.form.getlist("lock_player")
         excluded_players = request.form.getlist("exclude_player")
-        num_lineups = int(request.form.get("num_lineups", 1))
+        try:
+            num_lineups = int(request.form.get("num_lineups", 1))
+        except ValueError:
+            num_lineups = 1
+        num_lineups = min(max(num_lineups, 1), MAX_LINEUPS)
         time_filter = request.form.get("time_filter", "all")
         stack_team = request.form.get("stack_team")  # dropdown value
 
@@ -213,49 +471,86 @@ def player_pool():
 
         return redirect(url_for("lineups_page"))
 
-    filtered_df = filter_by_game_time(df, time_filter)
+    filtered_df = load_filtered_players(time_filter)
     if excluded_players:
         filtered_df = filtered_df[~filtered_df['unique_id'].isin(excluded_players)]
+    cache.set(pool_cache_key(time_filter, excluded_players), build_pool_payload(lineup_frame(filtered_df)),
+              timeout=PLAYERS_CACHE_TIMEOUT)
 
-    data = filtered_df.fillna("").to_dict(orient="records")
+    # Parallel column lists instead of one dict per row
     headers = DISPLAY_COLUMNS
+    cols = {c: filtered_df[c].fillna("").tolist() for c in headers + ["unique_id"]}
 
     return render_template(
         "player_pool.html",
         headers=headers,
-        data=data,
+        cols=cols,
+        row_count=len(filtered_df),
         teams=teams,
         locked_players=locked_players,
         excluded_players=excluded_players,
         display_pos=display_pos,
         num_lineups=num_lineups,
+        max_lineups=MAX_LINEUPS,
         time_filter=time_filter,
         stack_team=stack_team
     )
 
 @app.route("/lineups", methods=["GET"])
 def lineups_page():
-    df, teams = load_players()
-    locked_players = session.get('locked_players', [])
-    excluded_players = session.get('excluded_players', [])
-    num_lineups = int(session.get('num_lineups', 1))
+    locked_players = frozenset(session.get('locked_players', []))
+    excluded_players = frozenset(session.get('excluded_players', []))
+    num_lineups = min(max(int(session.get('num_lineups', 1)), 1), MAX_LINEUPS)
     time_filter = session.get('time_filter', 'all')
     stack_team = session.get('stack_team', None)
 
-    filtered_df = filter_by_game_time(df, time_filter)
-    if excluded_players:
-        filtered_df = filtered_df[~filtered_df['unique_id'].isin(excluded_players)]
-
-    lineups = build_lineups(filtered_df, num_lineups, locked_players, excluded_players, stack_team)
+    # Each session gets a couple of jobs in flight; past that, keep polling the latest one
+    with JOBS_LOCK:
+        active = [j for j in session.get('job_ids', []) if j in JOBS and not JOBS[j]['future'].done()]
+    if len(active) >= MAX_ACTIVE_JOBS_PER_SESSION:
+        return redirect(url_for("lineups_job", job_id=active[-1]))
+
+    pool = get_pool_payload(time_filter, excluded_players)
+    job_id = submit_lineups_job(pool, num_lineups, locked_players, stack_team, time_filter)
+    session['job_ids'] = active + [job_id]
+    return redirect(url_for("lineups_job", job_id=job_id))
+
+@app.route("/lineups/<job_id>", methods=["GET"])
+def lineups_job(job_id):
+    with JOBS_LOCK:
+        job = JOBS.get(job_id)
+    if job is None:
+        return redirect(url_for("player_pool"))
+
+    future = job['future']
+    done = future.done()
+    lineups = []
+    warning = None
+    if done:
+        try:
+            lineups = future.result()
+        except Exception as e:
+            print("Lineup job error:", e)
+    elif time.time() - job['created'] > JOB_DEADLINE + JOB_DEADLINE_GRACE:
+        future.cancel()
+        warning = "Lineup generation timed out. Try fewer lineups."
 
     return render_template(
         "lineups.html",
         lineups=lineups,
-        num_lineups=num_lineups,
+        pending=not done and warning is None,
+        warning=warning,
+        num_lineups=job['num_lineups'],
         display_pos=display_pos,
-        time_filter=time_filter
+        time_filter=job['time_filter']
     )
 
+@app.route("/admin/refresh", methods=["POST"])
+def refresh_players():
+    # Filtered frames and pool payloads are all derived from 'players'
+    cache.clear()
+    return redirect(url_for("player_pool"))
+
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5005))